@@ -12,6 +12,44 @@ from datetime import datetime
 
 MAX_CONTEXT_MESSAGES = 30
 
+# PostgREST error code for "function not found" (migrations/004 not applied)
+RPC_MISSING_CODE = "PGRST202"
+
+# Postgres unique_violation: (chat_id, seq) already taken by another worker
+UNIQUE_VIOLATION_CODE = "23505"
+
+# Postgres invalid_text_representation: chat id that is not a valid key
+INVALID_TEXT_CODE = "22P02"
+
+
+class SeqConflict(Exception):
+    pass
+
+rpc_available = {
+    "chat_recent_messages": True,
+    "chat_append_turn": True
+}
+
+
+# ==========================================
+# RPC (FALLS BACK WHEN FUNCTION IS MISSING)
+# ==========================================
+
+def _rpc(name: str, params: dict):
+    if not rpc_available[name]:
+        return None
+
+    try:
+        return supabase.rpc(name, params).execute()
+
+    except Exception as e:
+        if getattr(e, "code", None) != RPC_MISSING_CODE:
+            raise
+
+        print(f"=== RPC {name} NOT INSTALLED, USING TABLE QUERIES ===")
+        rpc_available[name] = False
+        return None
+
 
 # ==========================================
 # CREATE CHAT
@@ -65,6 +103,38 @@ def get_all_chats():
         return []
 
 
+# ==========================================
+# CHAT EXISTS
+# ==========================================
+
+def chat_exists(chat_id: str) -> bool:
+    """
+    Raises on database errors, so callers can tell
+    "no such chat" from "could not check".
+    """
+
+    try:
+        response = (
+            supabase
+            .table("chats")
+            .select("id")
+            .eq("id", chat_id)
+            .limit(1)
+            .execute()
+        )
+
+        return bool(response.data)
+
+    except Exception as e:
+        if getattr(e, "code", None) == INVALID_TEXT_CODE:
+            return False
+
+        print("=== CHAT EXISTS ERROR ===")
+        print(str(e))
+        traceback.print_exc()
+        raise
+
+
 # ==========================================
 # DELETE CHAT
 # ==========================================
@@ -81,21 +151,51 @@ def delete_chat(chat_id: str):
 
 
 # ==========================================
-# SAVE MESSAGE
+# SAVE TURN (USER + ASSISTANT)
 # ==========================================
 
-def save_message(chat_id: str, role: str, content: str):
+def save_turn(chat_id: str, user_content: str, assistant_content: str, user_seq: int = None, assistant_seq: int = None):
+    """
+    Stores both messages of a turn and returns their (user_seq, assistant_seq).
+    With migrations/004 the database allocates seq and the passed
+    numbers are ignored; the table fallback uses them and raises
+    SeqConflict if another writer already took them.
+    """
+
     try:
-        supabase.table("chat_memory").insert({
-            "chat_id": chat_id,
-            "role": role,
-            "content": content
-        }).execute()
+        response = _rpc("chat_append_turn", {
+            "p_chat_id": chat_id,
+            "p_user_content": user_content,
+            "p_assistant_content": assistant_content
+        })
+
+        # an old chat_append_turn without seq allocation answers with no rows;
+        # the turn is already stored then, only its seq numbers are unknown
+        if response is not None and response.data:
+            row = response.data[0]
+            return row["user_seq"], row["assistant_seq"]
+
+        if response is not None:
+            print("=== RPC chat_append_turn RETURNED NO SEQ, USING TABLE QUERIES ===")
+            rpc_available["chat_append_turn"] = False
+            return user_seq, assistant_seq
+
+        # both rows in one insert: one round trip, and never half a turn
+        supabase.table("chat_memory").insert([
+            {"chat_id": chat_id, "role": "user", "content": user_content, "seq": user_seq},
+            {"chat_id": chat_id, "role": "assistant", "content": assistant_content, "seq": assistant_seq}
+        ]).execute()
+
+        return user_seq, assistant_seq
 
     except Exception as e:
-        print("=== SUPABASE SAVE ERROR ===")
+        if getattr(e, "code", None) == UNIQUE_VIOLATION_CODE:
+            raise SeqConflict(str(e))
+
+        print("=== SUPABASE SAVE TURN ERROR ===")
         print(str(e))
         traceback.print_exc()
+        raise
 
 
 # ==========================================
@@ -104,25 +204,154 @@ def save_message(chat_id: str, role: str, content: str):
 
 def load_history(chat_id: str):
     try:
+        response = _rpc("chat_recent_messages", {
+            "p_chat_id": chat_id,
+            "p_limit": MAX_CONTEXT_MESSAGES
+        })
+
+        if response is not None:
+            return response.data or []
+
         response = (
             supabase
             .table("chat_memory")
             .select("*")
             .eq("chat_id", chat_id)
-            .order("created_at", desc=False)
-            .limit(200)
+            .order("seq", desc=True, nullsfirst=False)
+            .order("created_at", desc=True)
+            .order("id", desc=True)
+            .limit(MAX_CONTEXT_MESSAGES)
+            .execute()
+        )
+
+        # newest MAX_CONTEXT_MESSAGES, returned oldest first (as chat_recent_messages)
+        return list(reversed(response.data or []))
+
+    except Exception as e:
+        print("=== SUPABASE LOAD ERROR ===")
+        print(str(e))
+        traceback.print_exc()
+        return []
+
+
+# ==========================================
+# LAST SEQUENCE NUMBER
+# ==========================================
+
+def get_last_seq(chat_id: str) -> int:
+    try:
+        response = (
+            supabase
+            .table("chat_memory")
+            .select("seq")
+            .eq("chat_id", chat_id)
+            .not_.is_("seq", "null")
+            .order("seq", desc=True)
+            .limit(1)
             .execute()
         )
 
         data = response.data or []
 
-        if len(data) > MAX_CONTEXT_MESSAGES:
-            data = data[-MAX_CONTEXT_MESSAGES:]
+        return data[0]["seq"] if data else 0
+
+    except Exception as e:
+        print("=== SUPABASE SEQ ERROR ===")
+        print(str(e))
+        traceback.print_exc()
+        raise
+
+
+# ==========================================
+# ITERATE ALL MESSAGES (KEYSET PAGINATION)
+# ==========================================
 
-        return data
+EXPORT_PAGE_SIZE = 500
+
+
+def iter_chat_messages(chat_id: str, page_size: int = EXPORT_PAGE_SIZE):
+    """
+    Same order as load_history: legacy rows without seq first
+    (by created_at, id), then sequenced rows by seq. A turn's two
+    rows share one created_at, so seq is what keeps them in order.
+    """
+
+    try:
+        yield from _iter_unsequenced(chat_id, page_size)
+        yield from _iter_sequenced(chat_id, page_size)
 
     except Exception as e:
-        print("=== SUPABASE LOAD ERROR ===")
+        print("=== SUPABASE EXPORT ERROR ===")
         print(str(e))
         traceback.print_exc()
-        return []
\ No newline at end of file
+        raise
+
+
+def _iter_unsequenced(chat_id: str, page_size: int):
+    last_created_at = None
+    last_id = None
+
+    while True:
+        query = (
+            supabase
+            .table("chat_memory")
+            .select("*")
+            .eq("chat_id", chat_id)
+            .is_("seq", "null")
+        )
+
+        if last_created_at is not None:
+            query = query.or_(
+                f'created_at.gt."{last_created_at}",'
+                f'and(created_at.eq."{last_created_at}",id.gt.{last_id})'
+            )
+
+        response = (
+            query
+            .order("created_at", desc=False)
+            .order("id", desc=False)
+            .limit(page_size)
+            .execute()
+        )
+
+        rows = response.data or []
+
+        yield from rows
+
+        if len(rows) < page_size:
+            return
+
+        last_created_at = rows[-1]["created_at"]
+        last_id = rows[-1]["id"]
+
+
+def _iter_sequenced(chat_id: str, page_size: int):
+    last_seq = None
+
+    while True:
+        query = (
+            supabase
+            .table("chat_memory")
+            .select("*")
+            .eq("chat_id", chat_id)
+            .not_.is_("seq", "null")
+        )
+
+        if last_seq is not None:
+            query = query.gt("seq", last_seq)
+
+        response = (
+            query
+            .order("seq", desc=False)
+            .limit(page_size)
+            .execute()
+        )
+
+        rows = response.data or []
+
+        yield from rows
+
+        if len(rows) < page_size:
+            return
+
+        last_seq = rows[-1]["seq"]
@@ -0,0 +1,148 @@
+# chat_sequencer.py
+# PER-CHAT ORDERED TURN PIPELINE
+# turns inside one chat run one at a time, different chats stay parallel
+
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+
+from chat_memory import get_last_seq, save_turn, SeqConflict
+from deadline import Deadline, run_cancellable
+
+
+# ==========================================
+# SETTINGS
+# ==========================================
+
+CHAT_QUEUE_IDLE_SECONDS = int(os.getenv("CHAT_QUEUE_IDLE_SECONDS", "300"))
+EVICT_INTERVAL_SECONDS = 30
+SEQ_CONFLICT_RETRIES = 3
+
+
+class TurnSequence:
+
+    def __init__(self, chat_id: str):
+        self.chat_id = chat_id
+        self.reseed()
+
+    def reseed(self):
+        self.next_seq = get_last_seq(self.chat_id) + 1
+
+    def save_turn(self, message: str, content: str):
+        """
+        Persists the turn and returns (user_seq, assistant_seq).
+        Another worker may have written to this chat since we seeded;
+        on a seq clash re-read the last seq from the database and retry.
+        """
+
+        for _ in range(SEQ_CONFLICT_RETRIES):
+            try:
+                user_seq, assistant_seq = save_turn(
+                    self.chat_id,
+                    message,
+                    content,
+                    self.next_seq,
+                    self.next_seq + 1
+                )
+
+            except SeqConflict:
+                print(f"=== SEQ CONFLICT IN CHAT {self.chat_id}, RESEEDING ===")
+                self.reseed()
+                continue
+
+            self.next_seq = max(self.next_seq, assistant_seq + 1)
+            return user_seq, assistant_seq
+
+        raise SeqConflict(f"Could not allocate seq for chat {self.chat_id}")
+
+
+class ChatSequencer:
+
+    def __init__(self, idle_seconds: int = CHAT_QUEUE_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self.chats = {}
+        self.last_evict = time.monotonic()
+
+
+    # ==========================================
+    # TURN
+    # ==========================================
+
+    @asynccontextmanager
+    async def turn(self, chat_id: str, deadline=None, is_disconnected=None, reserve: float = 0.0):
+        """
+        Waits for this chat's previous turns. With a deadline the wait
+        itself counts against it, and a client that leaves while queued
+        is dropped before it does any work.
+        """
+
+        self._evict_idle()
+
+        chat = self.chats.get(chat_id)
+
+        if chat is None:
+            chat = {
+                "lock": asyncio.Lock(),
+                "users": 0,
+                "sequence": None,
+                "last_used": time.monotonic()
+            }
+            self.chats[chat_id] = chat
+
+        chat["users"] += 1
+
+        try:
+            await self._acquire(chat["lock"], deadline, is_disconnected, reserve)
+
+            try:
+                if chat["sequence"] is None:
+                    chat["sequence"] = TurnSequence(chat_id)
+
+                yield chat["sequence"]
+
+            finally:
+                chat["lock"].release()
+
+        finally:
+            chat["users"] -= 1
+            chat["last_used"] = time.monotonic()
+
+    async def _acquire(self, lock: asyncio.Lock, deadline, is_disconnected, reserve: float):
+
+        if deadline is None and is_disconnected is None:
+            await lock.acquire()
+            return
+
+        acquire = asyncio.ensure_future(lock.acquire())
+
+        try:
+            await run_cancellable(acquire, deadline or Deadline(), "turn queue", is_disconnected, reserve)
+
+        except BaseException:
+            # gave up just as the lock was granted: hand it on
+            if acquire.done() and not acquire.cancelled() and acquire.exception() is None:
+                lock.release()
+            raise
+
+
+    # ==========================================
+    # EVICT IDLE CHATS
+    # ==========================================
+
+    def _evict_idle(self):
+
+        now = time.monotonic()
+
+        if now - self.last_evict < EVICT_INTERVAL_SECONDS:
+            return
+
+        self.last_evict = now
+
+        idle = [
+            chat_id for chat_id, chat in self.chats.items()
+            if chat["users"] == 0 and now - chat["last_used"] > self.idle_seconds
+        ]
+
+        for chat_id in idle:
+            del self.chats[chat_id]
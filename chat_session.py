@@ -0,0 +1,127 @@
+# chat_session.py
+# SERVER-SIDE CHAT SESSION (HISTORY + EMOTIONAL STATE + PROMPT PREFIX)
+
+from typing import List, Dict
+
+from chat_memory import load_history, MAX_CONTEXT_MESSAGES
+from prompt.emotional_state import EmotionalState
+
+
+class ChatSession:
+
+    def __init__(self, chat_id: str, sacred_personality, dialogue_governor):
+
+        self.chat_id = chat_id
+        self.dialogue_governor = dialogue_governor
+
+        # personality prompt is static, so assemble it once per session
+        self.system_prefix = sacred_personality.build_system_message()["content"]
+
+        self.emotional_state = EmotionalState()
+        self.history: List[Dict[str, str]] = []
+        self.depth_level = None
+        self.message_kind = None
+
+        # highest seq this session has seen; behind the sequencer means
+        # another request or socket wrote to the chat since
+        self.last_seq = 0
+
+
+    # ==========================================
+    # LOAD
+    # ==========================================
+
+    def load(self):
+
+        rows = load_history(self.chat_id)
+
+        self.history = [
+            {"role": msg["role"], "content": msg["content"]}
+            for msg in rows
+            if msg["role"] != "system"
+        ]
+
+        self.last_seq = max((msg.get("seq") or 0 for msg in rows), default=0)
+
+        return self
+
+    def sync(self, next_seq: int):
+        """
+        Reloads history if other writers appended to the chat
+        since this session last saw it.
+        """
+
+        if next_seq > self.last_seq + 1:
+            self.load()
+
+        return self
+
+
+    # ==========================================
+    # BUILD MESSAGES FOR PROVIDER
+    # ==========================================
+
+    def build_messages(self, message: str) -> List[Dict[str, str]]:
+
+        self.emotional_state.update_from_text(message)
+        self.message_kind = self.emotional_state.classify_text(message)
+
+        system_content = self.system_prefix
+        system_content += "\n\n" + self.emotional_state.build_context()["content"]
+
+        conversation = self.history + [{"role": "user", "content": message}]
+
+        self.depth_level = self.dialogue_governor.detect_depth(conversation)
+
+        governor_message = self.dialogue_governor.build_governor_message(
+            conversation
+        )
+
+        system_content += "\n\n" + governor_message["content"]
+
+        messages: List[Dict[str, str]] = [
+            {"role": "system", "content": system_content}
+        ]
+
+        messages.extend(self.history)
+
+        messages.append({
+            "role": "user",
+            "content": message
+        })
+
+        return messages
+
+
+    # ==========================================
+    # APPEND TURN
+    # ==========================================
+
+    def append_turn(self, message: str, content: str, user_seq: int = None, assistant_seq: int = None):
+
+        # someone else wrote between our sync and our save: re-read instead
+        if user_seq is not None and user_seq > self.last_seq + 1:
+            self.load()
+            return
+
+        if assistant_seq is not None:
+            self.last_seq = assistant_seq
+
+        self.history.append({"role": "user", "content": message})
+        self.history.append({"role": "assistant", "content": content})
+
+        if len(self.history) > MAX_CONTEXT_MESSAGES:
+            self.history = self.history[-MAX_CONTEXT_MESSAGES:]
+
+
+    # ==========================================
+    # ROUTE (MODEL TIER FOR CURRENT TURN)
+    # ==========================================
+
+    def route(self, model_router, messages: List[Dict[str, str]]) -> dict:
+
+        return model_router.route(
+            self.message_kind,
+            self.depth_level,
+            messages
+        )
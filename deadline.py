@@ -0,0 +1,106 @@
+# deadline.py
+# END-TO-END REQUEST DEADLINES + CANCELLATION ON CLIENT DISCONNECT
+
+import os
+import time
+import asyncio
+
+
+# ==========================================
+# SETTINGS
+# ==========================================
+
+CHAT_DEADLINE_SECONDS = float(os.getenv("CHAT_DEADLINE_SECONDS", "55"))
+
+# time kept back from the upstream call for persisting the turn (save_turn)
+PERSIST_RESERVE_SECONDS = float(os.getenv("PERSIST_RESERVE_SECONDS", "2"))
+
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+class DeadlineExceeded(Exception):
+
+    def __init__(self, phase: str):
+        super().__init__(f"Deadline exceeded during {phase}")
+        self.phase = phase
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class Deadline:
+
+    def __init__(self, seconds: float = None):
+        self.expires = time.monotonic() + seconds if seconds is not None else None
+
+    @classmethod
+    def from_request(cls, header_ms, body_ms):
+        """
+        Client may ask for a shorter deadline (X-Deadline-Ms header
+        or "deadline_ms" in the body); it never exceeds the configured one.
+        """
+
+        seconds = CHAT_DEADLINE_SECONDS
+
+        for value in (header_ms, body_ms):
+            if value is None:
+                continue
+
+            try:
+                seconds = min(seconds, max(0.0, float(value) / 1000))
+            except (TypeError, ValueError):
+                pass
+
+        return cls(seconds)
+
+    def remaining(self, reserve: float = 0.0):
+
+        if self.expires is None:
+            return None
+
+        return self.expires - time.monotonic() - reserve
+
+    def check(self, phase: str, reserve: float = 0.0):
+
+        remaining = self.remaining(reserve)
+
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded(phase)
+
+
+# ==========================================
+# RUN CANCELLABLE
+# ==========================================
+
+async def run_cancellable(coro, deadline: Deadline, phase: str, is_disconnected=None, reserve: float = 0.0):
+    """
+    Runs `coro` (or an existing task) and cancels it (closing the upstream
+    HTTP request) when the deadline passes or the client goes away.
+    """
+
+    task = asyncio.ensure_future(coro)
+
+    try:
+        while True:
+            remaining = deadline.remaining(reserve)
+
+            if remaining is not None and remaining <= 0:
+                raise DeadlineExceeded(phase)
+
+            timeout = DISCONNECT_POLL_SECONDS if is_disconnected else remaining
+
+            if remaining is not None and timeout is not None:
+                timeout = min(timeout, remaining)
+
+            done, _ = await asyncio.wait({task}, timeout=timeout)
+
+            if done:
+                return task.result()
+
+            if is_disconnected and await is_disconnected():
+                raise ClientDisconnected()
+
+    finally:
+        if not task.done():
+            task.cancel()
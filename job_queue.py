@@ -0,0 +1,183 @@
+# job_queue.py
+# ASYNC JOB MODE (IN-PROCESS SCHEDULER WITH BOUNDED WORKERS)
+
+import os
+import time
+import uuid
+import asyncio
+import traceback
+
+
+# ==========================================
+# SETTINGS
+# ==========================================
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "600"))
+JOB_MAX_WAIT_SECONDS = 30
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobScheduler:
+
+    def __init__(
+            self,
+            workers: int = JOB_WORKERS,
+            queue_size: int = JOB_QUEUE_SIZE,
+            ttl: int = JOB_TTL_SECONDS
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.ttl = ttl
+
+        self.jobs = {}
+        self.queue = None
+        self.tasks = []
+
+
+    # ==========================================
+    # LIFECYCLE
+    # ==========================================
+
+    def start(self):
+
+        if self.tasks:
+            return
+
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+
+        for _ in range(self.workers):
+            self.tasks.append(asyncio.create_task(self._worker()))
+
+        self.tasks.append(asyncio.create_task(self._reaper()))
+
+    async def stop(self):
+
+        for task in self.tasks:
+            task.cancel()
+
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+
+    # ==========================================
+    # SUBMIT
+    # ==========================================
+
+    def submit(self, func, *args, **kwargs) -> str:
+
+        if self.queue is None:
+            self.start()
+
+        job_id = uuid.uuid4().hex
+
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "finished_at": None,
+            "done": asyncio.Event()
+        }
+
+        try:
+            self.queue.put_nowait((job, func, args, kwargs))
+        except asyncio.QueueFull:
+            raise JobQueueFull("Job queue is full")
+
+        self.jobs[job_id] = job
+
+        return job_id
+
+
+    # ==========================================
+    # READ
+    # ==========================================
+
+    def get(self, job_id: str):
+
+        job = self.jobs.get(job_id)
+
+        if job is None:
+            return None
+
+        return self._public(job)
+
+    async def wait(self, job_id: str, timeout: float):
+
+        job = self.jobs.get(job_id)
+
+        if job is None:
+            return None
+
+        timeout = max(0.0, min(timeout, JOB_MAX_WAIT_SECONDS))
+
+        try:
+            await asyncio.wait_for(job["done"].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        return self._public(job)
+
+    def _public(self, job: dict) -> dict:
+        return {
+            "job_id": job["id"],
+            "status": job["status"],
+            "result": job["result"],
+            "error": job["error"]
+        }
+
+
+    # ==========================================
+    # WORKERS
+    # ==========================================
+
+    async def _worker(self):
+
+        while True:
+            job, func, args, kwargs = await self.queue.get()
+
+            job["status"] = "running"
+
+            try:
+                job["result"] = await func(*args, **kwargs)
+                job["status"] = "done"
+
+            except asyncio.CancelledError:
+                job["status"] = "cancelled"
+                job["done"].set()
+                raise
+
+            except Exception as e:
+                print("=== JOB ERROR ===")
+                print(str(e))
+                traceback.print_exc()
+                job["status"] = "error"
+                job["error"] = str(e)
+
+            job["finished_at"] = time.time()
+            job["done"].set()
+            self.queue.task_done()
+
+    async def _reaper(self):
+
+        while True:
+            await asyncio.sleep(max(1, self.ttl // 10))
+            self.expire()
+
+    def expire(self):
+
+        now = time.time()
+
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job["finished_at"] and now - job["finished_at"] > self.ttl
+        ]
+
+        for job_id in expired:
+            del self.jobs[job_id]
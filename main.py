@@ -1,34 +1,58 @@
-from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi import FastAPI, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from typing import List, Dict
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 import os
+import re
+import json
+import zlib
+import itertools
 import traceback
 
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from slowapi.middleware import SlowAPIMiddleware
+from slowapi.middleware import SlowAPIASGIMiddleware
+from limits import parse as parse_rate_limit
+from limits.storage import MemoryStorage
+from limits.strategies import MovingWindowRateLimiter
 
 from chat_memory import (
-    save_message,
-    load_history,
     create_chat,
     get_all_chats,
-    delete_chat
+    delete_chat,
+    chat_exists,
+    iter_chat_messages
 )
 
 from providers.gigachat_provider import GigaChatProvider
-from prompt.emotional_state import EmotionalState
+from providers.model_router import ModelRouter
+from job_queue import JobScheduler, JobQueueFull
+from chat_session import ChatSession
+from chat_sequencer import ChatSequencer
+from profiler import RequestProfiler, ProfilingMiddleware, PROFILE_KIND, PROFILE_NOTE
+from traffic_recorder import TrafficRecorder
+from deadline import (
+    Deadline,
+    DeadlineExceeded,
+    ClientDisconnected,
+    run_cancellable,
+    PERSIST_RESERVE_SECONDS
+)
 from prompt.sacred_personality import SacredPersonality
 from prompt.dialogue_governor import DialogueGovernor
 
 
+CHAT_RATE_LIMIT = "20/minute"
+
 limiter = Limiter(key_func=get_remote_address)
 
+# /ws/chat turns bypass slowapi, so they get the same policy per client IP
+ws_turn_limit = parse_rate_limit(CHAT_RATE_LIMIT)
+ws_turn_limiter = MovingWindowRateLimiter(MemoryStorage())
+
 app = FastAPI(title="AI Server", version="18.0-multi-chat")
 
 app.state.limiter = limiter
-app.add_middleware(SlowAPIMiddleware)
+app.add_middleware(SlowAPIASGIMiddleware)
 
 FRONTEND_URL = os.getenv("FRONTEND_URL", "*")
 SERVER_API_KEY = os.getenv("SERVER_API_KEY")
@@ -49,6 +73,33 @@ print("=== AI SERVER STARTED (MULTI-CHAT MODE) ===")
 ai_provider = GigaChatProvider()
 sacred_personality = SacredPersonality()
 dialogue_governor = DialogueGovernor()
+model_router = ModelRouter()
+request_profiler = RequestProfiler()
+traffic_recorder = TrafficRecorder()
+job_scheduler = JobScheduler()
+chat_sequencer = ChatSequencer()
+
+cancellations = {
+    "deadline": 0,
+    "disconnect": 0
+}
+
+app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+
+
+@app.on_event("startup")
+async def start_job_scheduler():
+    job_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_scheduler():
+    await job_scheduler.stop()
+
+
+@app.on_event("shutdown")
+async def stop_traffic_recorder():
+    traffic_recorder.close()
 
 
 def verify_api_key(x_api_key: str):
@@ -56,12 +107,128 @@ def verify_api_key(x_api_key: str):
         raise HTTPException(status_code=403, detail="Forbidden")
 
 
+def verify_profile_admin_key(x_admin_key: str):
+    # without PROFILE_ADMIN_KEY the profile endpoints do not exist
+    if not request_profiler.admin_key:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    if x_admin_key != request_profiler.admin_key:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+# =========================================================
+# CHAT TURN
+# =========================================================
+
+async def run_chat_turn(chat_id: str, message: str, deadline: Deadline = None, is_disconnected=None) -> str:
+
+    trace = traffic_recorder.start(chat_id, message, "http")
+    deadline = deadline or Deadline()
+
+    try:
+        async with chat_sequencer.turn(chat_id, deadline, is_disconnected, PERSIST_RESERVE_SECONDS) as seq:
+
+            deadline.check("history load", PERSIST_RESERVE_SECONDS)
+
+            with trace.timed("history_seconds"):
+                session = ChatSession(chat_id, sacred_personality, dialogue_governor).load()
+
+            trace.history_size = len(session.history)
+
+            messages = session.build_messages(message)
+            route = session.route(model_router, messages)
+
+            # last point where dropping the turn costs nothing upstream
+            if is_disconnected and await is_disconnected():
+                raise ClientDisconnected()
+
+            with trace.timed("upstream_seconds"):
+                content = await run_cancellable(
+                    ai_provider.generate(messages, route),
+                    deadline,
+                    "upstream call",
+                    is_disconnected,
+                    reserve=PERSIST_RESERVE_SECONDS
+                )
+
+            model_router.record(route["name"], trace.seconds["upstream_seconds"])
+            trace.response_len = len(content)
+
+            # tokens are paid for from here on: keep the turn in history even if
+            # the client is gone, it will see the answer on reload
+            with trace.timed("save_seconds"):
+                seq.save_turn(message, content)
+
+        trace.outcome = "ok"
+        return content
+
+    except DeadlineExceeded:
+        trace.outcome = "deadline"
+        raise
+
+    except ClientDisconnected:
+        trace.outcome = "disconnect"
+        raise
+
+    finally:
+        traffic_recorder.record(trace)
+
+
+# =========================================================
+# WEBSOCKET TURN
+# =========================================================
+
+async def run_ws_turn(websocket: WebSocket, session: ChatSession, chat_id: str, message: str) -> str:
+
+    trace = traffic_recorder.start(chat_id, message, "ws")
+
+    try:
+        async with chat_sequencer.turn(chat_id) as seq:
+
+            with trace.timed("history_seconds"):
+                session.sync(seq.next_seq)
+
+            trace.history_size = len(session.history)
+
+            messages = session.build_messages(message)
+            route = session.route(model_router, messages)
+
+            parts = []
+
+            with trace.timed("upstream_seconds"):
+                async for token in ai_provider.generate_stream(messages, route):
+                    parts.append(token)
+                    await websocket.send_json({
+                        "type": "token",
+                        "content": token
+                    })
+
+            content = "".join(parts)
+            model_router.record(route["name"], trace.seconds["upstream_seconds"])
+            trace.response_len = len(content)
+
+            with trace.timed("save_seconds"):
+                user_seq, assistant_seq = seq.save_turn(message, content)
+
+            session.append_turn(message, content, user_seq, assistant_seq)
+
+        trace.outcome = "ok"
+        return content
+
+    except WebSocketDisconnect:
+        trace.outcome = "disconnect"
+        raise
+
+    finally:
+        traffic_recorder.record(trace)
+
+
 # =========================================================
 # CHAT
 # =========================================================
 
 @app.post("/chat")
-@limiter.limit("20/minute")
+@limiter.limit(CHAT_RATE_LIMIT)
 async def chat(request: Request, x_api_key: str = Header(...)):
 
     try:
@@ -69,7 +236,7 @@ async def chat(request: Request, x_api_key: str = Header(...)):
 
         body = await request.json()
         message = body.get("message")
-        chat_id = body.get("chat_id", "default_user")
+        chat_id = body.get("chat_id")
 
         if not message:
             return JSONResponse(
@@ -77,52 +244,221 @@ async def chat(request: Request, x_api_key: str = Header(...)):
                 content={"error": "Message field required"}
             )
 
-        history = load_history(chat_id)
+        # messages reference chats(id), so the chat must exist (POST /chats)
+        if not chat_id:
+            return JSONResponse(
+                status_code=400,
+                content={"error": "chat_id field required"}
+            )
+
+        if body.get("async"):
+            try:
+                job_id = job_scheduler.submit(run_chat_turn, chat_id, message)
+            except JobQueueFull as e:
+                return JSONResponse(
+                    status_code=503,
+                    content={"error": str(e)}
+                )
+
+            return JSONResponse(
+                status_code=202,
+                content={
+                    "job_id": job_id,
+                    "status": "queued",
+                    "chat_id": chat_id
+                }
+            )
+
+        deadline = Deadline.from_request(
+            request.headers.get("x-deadline-ms"),
+            body.get("deadline_ms")
+        )
 
-        messages: List[Dict[str, str]] = []
+        content = await run_chat_turn(
+            chat_id,
+            message,
+            deadline,
+            request.is_disconnected
+        )
 
-        # SYSTEM MESSAGE
-        system_message = sacred_personality.build_system_message()
+        return JSONResponse({
+            "response": content,
+            "chat_id": chat_id
+        })
 
-        emotional_state = EmotionalState()
-        emotional_state.update_from_text(message)
+    except DeadlineExceeded as e:
+        cancellations["deadline"] += 1
+        print(f"⏱ CHAT DEADLINE: {e.phase}")
+        return JSONResponse(
+            status_code=504,
+            content={"error": str(e)}
+        )
 
-        system_message["content"] += "\n\n" + emotional_state.build_context()["content"]
+    except ClientDisconnected:
+        cancellations["disconnect"] += 1
+        print("⏱ CHAT CLIENT DISCONNECTED")
+        return JSONResponse(
+            status_code=499,
+            content={"error": "Client disconnected"}
+        )
 
-        governor_message = dialogue_governor.build_governor_message(
-            history + [{"role": "user", "content": message}]
+    except Exception as e:
+        print("🔥 CHAT CRASH:")
+        traceback.print_exc()
+        return JSONResponse(
+            status_code=500,
+            content={"error": str(e)}
         )
 
-        system_message["content"] += "\n\n" + governor_message["content"]
 
-        messages.append(system_message)
+# =========================================================
+# WEBSOCKET CHAT (SESSION STATE KEPT IN MEMORY)
+# =========================================================
+
+@app.websocket("/ws/chat")
+async def ws_chat(websocket: WebSocket):
+
+    api_key = (
+        websocket.headers.get("x-api-key")
+        or websocket.query_params.get("api_key")
+    )
 
-        # HISTORY
-        for msg in history:
-            if msg["role"] != "system":
-                messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
+    if api_key != SERVER_API_KEY:
+        await websocket.close(code=1008)
+        return
+
+    chat_id = websocket.query_params.get("chat_id")
+
+    # messages reference chats(id), so the chat must exist (POST /chats)
+    if not chat_id:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+
+    try:
+        session = ChatSession(chat_id, sacred_personality, dialogue_governor).load()
+
+        while True:
+            try:
+                body = await websocket.receive_json()
+            except WebSocketDisconnect:
+                raise
+            except Exception:
+                body = None
+
+            if not isinstance(body, dict):
+                await websocket.send_json({
+                    "type": "error",
+                    "error": "Expected a JSON object"
                 })
+                continue
 
-        # USER MESSAGE
-        messages.append({
-            "role": "user",
-            "content": message
-        })
+            message = body.get("message")
+
+            if not message:
+                await websocket.send_json({
+                    "type": "error",
+                    "error": "Message field required"
+                })
+                continue
 
-        content = await ai_provider.generate(messages)
+            client_ip = websocket.client.host if websocket.client else "unknown"
 
-        save_message(chat_id, "user", message)
-        save_message(chat_id, "assistant", content)
+            if not ws_turn_limiter.hit(ws_turn_limit, "ws_chat", client_ip):
+                await websocket.send_json({
+                    "type": "error",
+                    "error": f"Rate limit exceeded: {CHAT_RATE_LIMIT}"
+                })
+                continue
+
+            # one failed turn is reported on the socket, not fatal to the session
+            try:
+                content = await run_ws_turn(websocket, session, chat_id, message)
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                print("🔥 WS CHAT TURN CRASH:")
+                traceback.print_exc()
+                await websocket.send_json({
+                    "type": "error",
+                    "error": str(e)
+                })
+                continue
 
-        return JSONResponse({
-            "response": content,
-            "chat_id": chat_id
-        })
+            await websocket.send_json({
+                "type": "done",
+                "response": content,
+                "chat_id": chat_id
+            })
+
+    except WebSocketDisconnect:
+        pass
 
     except Exception as e:
-        print("🔥 CHAT CRASH:")
+        print("🔥 WS CHAT CRASH:")
+        traceback.print_exc()
+        try:
+            await websocket.send_json({
+                "type": "error",
+                "error": str(e)
+            })
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+
+
+# =========================================================
+# JOB STATUS (POLLING)
+# =========================================================
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, x_api_key: str = Header(...)):
+
+    try:
+        verify_api_key(x_api_key)
+
+        job = job_scheduler.get(job_id)
+
+        if job is None:
+            return JSONResponse(
+                status_code=404,
+                content={"error": "Job not found"}
+            )
+
+        return JSONResponse(job)
+
+    except Exception as e:
+        print("🔥 GET JOB CRASH:")
+        traceback.print_exc()
+        return JSONResponse(
+            status_code=500,
+            content={"error": str(e)}
+        )
+
+
+# =========================================================
+# JOB STATUS (LONG-POLL)
+# =========================================================
+
+@app.get("/jobs/{job_id}/wait")
+async def wait_job(job_id: str, timeout: float = 25, x_api_key: str = Header(...)):
+
+    try:
+        verify_api_key(x_api_key)
+
+        job = await job_scheduler.wait(job_id, timeout)
+
+        if job is None:
+            return JSONResponse(
+                status_code=404,
+                content={"error": "Job not found"}
+            )
+
+        return JSONResponse(job)
+
+    except Exception as e:
+        print("🔥 WAIT JOB CRASH:")
         traceback.print_exc()
         return JSONResponse(
             status_code=500,
@@ -205,6 +541,163 @@ async def remove_chat(chat_id: str, x_api_key: str = Header(...)):
         )
 
 
+# =========================================================
+# EXPORT CHAT (STREAMING NDJSON)
+# =========================================================
+
+def _ndjson_lines(rows):
+    for row in rows:
+        yield (json.dumps(row, ensure_ascii=False, default=str) + "\n").encode()
+
+
+def _gzip_stream(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+
+    yield compressor.flush()
+
+
+@app.get("/chats/{chat_id}/export")
+async def export_chat(chat_id: str, gzip: bool = False, x_api_key: str = Header(...)):
+
+    try:
+        verify_api_key(x_api_key)
+
+        if not chat_exists(chat_id):
+            return JSONResponse(
+                status_code=404,
+                content={"error": "Chat not found"}
+            )
+
+        # the response body is lazy: pull the first page here so a failing
+        # database is a 500, not a truncated 200
+        rows = iter_chat_messages(chat_id)
+        first = next(rows, None)
+
+        if first is not None:
+            rows = itertools.chain([first], rows)
+
+        stream = _ndjson_lines(rows)
+        filename = "chat_" + re.sub(r"[^A-Za-z0-9_-]", "_", chat_id) + ".ndjson"
+        media_type = "application/x-ndjson"
+
+        if gzip:
+            stream = _gzip_stream(stream)
+            filename += ".gz"
+            media_type = "application/gzip"
+
+        return StreamingResponse(
+            stream,
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+
+    except Exception as e:
+        print("🔥 EXPORT CHAT CRASH:")
+        traceback.print_exc()
+        return JSONResponse(
+            status_code=500,
+            content={"error": str(e)}
+        )
+
+
+# =========================================================
+# METRICS
+# =========================================================
+
+@app.get("/metrics")
+async def metrics(x_api_key: str = Header(...)):
+
+    try:
+        verify_api_key(x_api_key)
+
+        return JSONResponse({
+            "routes": model_router.report(),
+            "hedging": ai_provider.hedger.report() if ai_provider.hedger else None,
+            "stream_hedging": ai_provider.stream_hedger.report() if ai_provider.stream_hedger else None,
+            "cancellations": cancellations
+        })
+
+    except Exception as e:
+        print("🔥 METRICS CRASH:")
+        traceback.print_exc()
+        return JSONResponse(
+            status_code=500,
+            content={"error": str(e)}
+        )
+
+
+# =========================================================
+# ADMIN: PROFILES
+# =========================================================
+
+@app.get("/admin/profiles")
+async def list_profiles(x_admin_key: str = Header(None)):
+    """
+    Profiles are deterministic cProfile captures of the whole
+    event-loop thread, not sampled stacks; see PROFILE_NOTE.
+    """
+
+    try:
+        verify_profile_admin_key(x_admin_key)
+
+        return JSONResponse({
+            "kind": PROFILE_KIND,
+            "note": PROFILE_NOTE,
+            "profiles": request_profiler.list()
+        })
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        print("🔥 LIST PROFILES CRASH:")
+        traceback.print_exc()
+        return JSONResponse(
+            status_code=500,
+            content={"error": str(e)}
+        )
+
+
+@app.get("/admin/profiles/{profile_id}")
+async def download_profile(profile_id: str, x_admin_key: str = Header(None)):
+
+    try:
+        verify_profile_admin_key(x_admin_key)
+
+        data = request_profiler.get_pstats(profile_id)
+
+        if data is None:
+            return JSONResponse(
+                status_code=404,
+                content={"error": "Profile not found"}
+            )
+
+        return Response(
+            content=data,
+            media_type="application/octet-stream",
+            headers={
+                "Content-Disposition": f'attachment; filename="{profile_id}.pstats"',
+                "X-Profile-Kind": PROFILE_KIND
+            }
+        )
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        print("🔥 DOWNLOAD PROFILE CRASH:")
+        traceback.print_exc()
+        return JSONResponse(
+            status_code=500,
+            content={"error": str(e)}
+        )
+
+
 # =========================================================
 # ROOT
 # =========================================================
@@ -215,4 +708,4 @@ async def root():
         "status": "ok",
         "provider": "gigachat",
         "mode": "multi-chat-enabled"
-    }
+    }
\ No newline at end of file
@@ -0,0 +1,8 @@
+-- 001_chat_memory_seq.sql
+-- per-chat turn sequence numbers (written by ChatSequencer)
+
+alter table chat_memory
+    add column if not exists seq bigint;
+
+create unique index if not exists chat_memory_chat_id_seq_key
+    on chat_memory (chat_id, seq);
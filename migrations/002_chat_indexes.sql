@@ -0,0 +1,8 @@
+-- 002_chat_indexes.sql
+-- composite indexes behind load_history, the export keyset scan and get_all_chats
+
+create index if not exists chat_memory_chat_id_created_at_idx
+    on chat_memory (chat_id, created_at, id);
+
+create index if not exists chats_created_at_idx
+    on chats (created_at desc);
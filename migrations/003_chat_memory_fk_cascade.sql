@@ -0,0 +1,24 @@
+-- 003_chat_memory_fk_cascade.sql
+-- deleting a chat removes its messages
+--
+-- chat_memory.chat_id must have the same type as chats.id.
+-- If chats.id is a uuid and chat_memory.chat_id is text, convert it first; rows whose
+-- chat_id is not a uuid (e.g. the old "default_user" fallback) have
+-- to be deleted or moved to a real chat before this works:
+--   alter table chat_memory alter column chat_id type uuid using chat_id::uuid;
+--
+-- /chat and /ws/chat now require chat_id from POST /chats; there is
+-- no "default_user" fallback anymore, since it could never satisfy this key.
+
+alter table chat_memory
+    drop constraint if exists chat_memory_chat_id_fkey;
+
+-- NOT VALID: existing orphan rows are left alone, new rows are checked
+alter table chat_memory
+    add constraint chat_memory_chat_id_fkey
+    foreign key (chat_id) references chats (id)
+    on delete cascade
+    not valid;
+
+-- run once orphans are cleaned up:
+-- alter table chat_memory validate constraint chat_memory_chat_id_fkey;
@@ -0,0 +1,54 @@
+-- 004_chat_rpc.sql
+-- single round-trip helpers called via supabase.rpc
+
+-- newest p_limit messages of a chat, returned oldest first
+create or replace function chat_recent_messages(
+    p_chat_id chat_memory.chat_id%type,
+    p_limit integer default 30
+)
+returns setof chat_memory
+language sql
+stable
+as $$
+    select *
+    from (
+        select *
+        from chat_memory
+        where chat_id = p_chat_id
+        order by seq desc nulls last, created_at desc, id desc
+        limit p_limit
+    ) recent
+    order by seq nulls first, created_at, id;
+$$;
+
+
+-- user + assistant messages of one turn in a single call;
+-- seq is allocated here so several worker processes can never
+-- hand out the same number for one chat
+create or replace function chat_append_turn(
+    p_chat_id chat_memory.chat_id%type,
+    p_user_content text,
+    p_assistant_content text
+)
+returns table (user_seq bigint, assistant_seq bigint)
+language plpgsql
+as $$
+declare
+    v_next bigint;
+begin
+    -- serialize allocation per chat for the rest of this transaction
+    perform pg_advisory_xact_lock(hashtextextended(p_chat_id::text, 0));
+
+    select coalesce(max(seq), 0) + 1
+    into v_next
+    from chat_memory
+    where chat_id = p_chat_id;
+
+    insert into chat_memory (chat_id, role, content, seq)
+    values
+        (p_chat_id, 'user', p_user_content, v_next),
+        (p_chat_id, 'assistant', p_assistant_content, v_next + 1);
+
+    return query select v_next, v_next + 1;
+end;
+$$;
@@ -0,0 +1,155 @@
+# profiler.py
+# ON-DEMAND REQUEST PROFILING (cProfile -> pstats RING BUFFER)
+
+import os
+import time
+import uuid
+import random
+import marshal
+import cProfile
+from collections import deque
+
+
+# ==========================================
+# SETTINGS
+# ==========================================
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "20"))
+PROFILE_ADMIN_KEY = os.getenv("PROFILE_ADMIN_KEY")
+
+# what a capture actually is: not a sampled stack profile
+PROFILE_KIND = "cprofile-deterministic-thread"
+PROFILE_NOTE = (
+    "Deterministic cProfile over the whole event-loop thread: every function "
+    "call is traced, so concurrent requests appear in the profile and run "
+    "slower while it is being captured."
+)
+
+
+class RequestProfiler:
+
+    def __init__(
+            self,
+            sample_rate: float = PROFILE_SAMPLE_RATE,
+            buffer_size: int = PROFILE_BUFFER_SIZE,
+            admin_key: str = PROFILE_ADMIN_KEY
+    ):
+        self.sample_rate = sample_rate
+        self.admin_key = admin_key
+        self.profiles = deque(maxlen=buffer_size)
+
+        # cProfile hooks the whole thread, so only one capture at a time
+        self.active = False
+
+
+    # ==========================================
+    # DECIDE
+    # ==========================================
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.admin_key) or self.sample_rate > 0
+
+    def should_profile(self, profile_header: str = None) -> bool:
+
+        if self.active:
+            return False
+
+        if self.admin_key and profile_header == self.admin_key:
+            return True
+
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+
+    # ==========================================
+    # CAPTURE
+    # ==========================================
+
+    async def capture(self, label: str, call):
+        """
+        Runs `call()` under deterministic cProfile. The hook covers the
+        whole thread, so other tasks running on the event loop at the same
+        time show up in the profile and pay the tracing overhead too.
+        """
+
+        self.active = True
+        profile = cProfile.Profile()
+        started = time.time()
+
+        profile.enable()
+
+        try:
+            return await call()
+
+        finally:
+            profile.disable()
+            self.active = False
+
+            profile.create_stats()
+
+            self.profiles.append({
+                "id": uuid.uuid4().hex,
+                "label": label,
+                "kind": PROFILE_KIND,
+                "created_at": started,
+                "duration": round(time.time() - started, 4),
+                "pstats": marshal.dumps(profile.stats)
+            })
+
+
+    # ==========================================
+    # READ
+    # ==========================================
+
+    def list(self) -> list:
+        return [
+            {key: value for key, value in entry.items() if key != "pstats"}
+            for entry in self.profiles
+        ]
+
+    def get_pstats(self, profile_id: str):
+        for entry in self.profiles:
+            if entry["id"] == profile_id:
+                return entry["pstats"]
+        return None
+
+
+# ==========================================
+# ASGI MIDDLEWARE
+# ==========================================
+
+class ProfilingMiddleware:
+    """
+    Plain ASGI wrapper: requests to other paths, or any request while
+    profiling is not configured, go straight to the app untouched.
+    """
+
+    def __init__(self, app, profiler: RequestProfiler, path: str = "/chat"):
+        self.app = app
+        self.profiler = profiler
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+
+        if (
+            scope["type"] != "http"
+            or scope["path"] != self.path
+            or not self.profiler.enabled
+        ):
+            return await self.app(scope, receive, send)
+
+        profile_header = None
+
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                profile_header = value.decode("latin-1")
+                break
+
+        if not self.profiler.should_profile(profile_header):
+            return await self.app(scope, receive, send)
+
+        await self.profiler.capture(
+            f"{scope['method']} {scope['path']}",
+            lambda: self.app(scope, receive, send)
+        )
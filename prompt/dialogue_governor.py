@@ -12,7 +12,7 @@ class DialogueGovernor:
     def build_governor_message(self, conversation: List[Dict]) -> Dict[str, str]:
 
         last_user_message = self._get_last_user_message(conversation)
-        depth_level = self._detect_depth(conversation)
+        depth_level = self.detect_depth(conversation)
 
         regulation = f"""
 CORE RULE:
@@ -65,7 +65,7 @@ DEPTH LEVEL: {depth_level}
                 return msg["content"].lower()
         return ""
 
-    def _detect_depth(self, conversation: List[Dict]) -> str:
+    def detect_depth(self, conversation: List[Dict]) -> str:
         message_count = len(conversation)
 
         if message_count < 4:
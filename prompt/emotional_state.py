@@ -2,8 +2,32 @@
 # ARKANUM EMOTIONAL STATE LAYER
 # Управляет глубиной, настроением и фокусом диалога
 
+import re
+
+
 class EmotionalState:
 
+    # глубина
+    DEEP_WORDS = [
+        "смысл",
+        "зачем",
+        "почему",
+        "кто я",
+        "предназначение",
+        "истина",
+        "реальность",
+        "осознан",
+        "существование"
+    ]
+
+    SHALLOW_WORDS = [
+        "привет",
+        "ок",
+        "понятно",
+        "да",
+        "нет"
+    ]
+
     def __init__(self):
 
         # базовые параметры
@@ -21,33 +45,12 @@ class EmotionalState:
 
         text_lower = text.lower()
 
-        # глубина
-        deep_words = [
-            "смысл",
-            "зачем",
-            "почему",
-            "кто я",
-            "предназначение",
-            "истина",
-            "реальность",
-            "осознан",
-            "существование"
-        ]
-
-        shallow_words = [
-            "привет",
-            "ок",
-            "понятно",
-            "да",
-            "нет"
-        ]
-
         # увеличиваем глубину
-        if any(word in text_lower for word in deep_words):
+        if any(word in text_lower for word in self.DEEP_WORDS):
             self.depth = min(1.0, self.depth + 0.1)
 
         # уменьшаем глубину
-        elif any(word in text_lower for word in shallow_words):
+        elif any(word in text_lower for word in self.SHALLOW_WORDS):
             self.depth = max(0.2, self.depth - 0.05)
 
         # настроение
@@ -74,6 +77,26 @@ class EmotionalState:
             self.focus = "balanced"
 
 
+    # ==========================
+    # CLASSIFY ONE MESSAGE
+    # ==========================
+    # surface only if the whole message is shallow words ("ок", "да, понятно"),
+    # so "когда" or "около" do not count as "да" / "ок"
+    def classify_text(self, text: str) -> str:
+
+        text_lower = (text or "").lower()
+
+        if any(word in text_lower for word in self.DEEP_WORDS):
+            return "deep"
+
+        words = re.findall(r"\w+", text_lower)
+
+        if words and all(word in self.SHALLOW_WORDS for word in words):
+            return "surface"
+
+        return "neutral"
+
+
     # ==========================
     # BUILD CONTEXT FOR MODEL
     # ==========================
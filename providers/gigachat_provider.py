@@ -6,8 +6,12 @@ import time
 import httpx
 import base64
 import uuid
+import json
 from dotenv import load_dotenv
 
+from providers.token_cache import create_token_cache
+from providers.hedging import Hedger, HEDGE_ENABLED
+
 
 # ==========================================
 # LOAD ENV
@@ -28,9 +32,14 @@ CHAT_URL = "https://gigachat.devices.sberbank.ru/api/v1/chat/completions"
 
 class GigaChatProvider:
 
-    def __init__(self):
+    def __init__(self, token_cache=None, hedge: bool = HEDGE_ENABLED):
         self.token = None
         self.expire = 0
+        self.token_cache = token_cache or create_token_cache()
+        self.hedger = Hedger() if hedge else None
+
+        # streams hedge on time to first token, a different distribution
+        self.stream_hedger = Hedger() if hedge else None
 
 
     # ==========================================
@@ -42,6 +51,29 @@ class GigaChatProvider:
         if self.token and time.time() < self.expire:
             return self.token
 
+        # another worker may have refreshed it already
+        if self._load_cached_token():
+            return self.token
+
+        async with self.token_cache.refresh_lock():
+
+            if self._load_cached_token():
+                return self.token
+
+            return await self._fetch_token()
+
+    def _load_cached_token(self) -> bool:
+
+        cached = self.token_cache.read()
+
+        if not cached:
+            return False
+
+        self.token, self.expire = cached
+        return True
+
+    async def _fetch_token(self):
+
         basic_auth = f"{CLIENT_ID}:{CLIENT_SECRET}".encode()
         basic_auth_b64 = base64.b64encode(basic_auth).decode()
 
@@ -75,16 +107,18 @@ class GigaChatProvider:
         self.token = token_json["access_token"]
         self.expire = time.time() + 1700
 
+        self.token_cache.write(self.token, self.expire)
+
         return self.token
 
 
     # ==========================================
-    # GENERATE RESPONSE
+    # BUILD REQUEST
     # ==========================================
 
-    async def generate(self, messages: list):
+    def _build_request(self, token: str, messages: list, stream: bool, route: dict = None):
 
-        token = await self.get_token()
+        route = route or {}
 
         headers = {
             "Authorization": f"Bearer {token}",
@@ -92,12 +126,37 @@ class GigaChatProvider:
         }
 
         payload = {
-            "model": "GigaChat",
+            "model": route.get("model", "GigaChat"),
             "messages": messages,
-            "temperature": 0.7,
-            "stream": False
+            "temperature": route.get("temperature", 0.7),
+            "stream": stream
         }
 
+        if route.get("max_tokens"):
+            payload["max_tokens"] = route["max_tokens"]
+
+        return headers, payload
+
+
+    # ==========================================
+    # GENERATE RESPONSE
+    # ==========================================
+
+    async def generate(self, messages: list, route: dict = None):
+
+        token = await self.get_token()
+
+        if self.hedger:
+            return await self.hedger.run(
+                lambda: self._generate_once(token, messages, route)
+            )
+
+        return await self._generate_once(token, messages, route)
+
+    async def _generate_once(self, token: str, messages: list, route: dict = None):
+
+        headers, payload = self._build_request(token, messages, stream=False, route=route)
+
         # 🔥 SSL FIX FOR RENDER
         async with httpx.AsyncClient(
                 timeout=60,
@@ -120,4 +179,63 @@ class GigaChatProvider:
         except Exception:
             content = "Ошибка получения ответа"
 
-        return content
\ No newline at end of file
+        return content
+
+
+    # ==========================================
+    # GENERATE RESPONSE (STREAMING)
+    # ==========================================
+
+    async def generate_stream(self, messages: list, route: dict = None):
+
+        token = await self.get_token()
+
+        if self.stream_hedger:
+            stream = self.stream_hedger.run_stream(
+                lambda: self._stream_once(token, messages, route)
+            )
+        else:
+            stream = self._stream_once(token, messages, route)
+
+        async for delta in stream:
+            yield delta
+
+    async def _stream_once(self, token: str, messages: list, route: dict = None):
+
+        headers, payload = self._build_request(token, messages, stream=True, route=route)
+
+        # 🔥 SSL FIX FOR RENDER
+        async with httpx.AsyncClient(
+                timeout=60,
+                verify=False
+        ) as client:
+
+            async with client.stream(
+                "POST",
+                CHAT_URL,
+                headers=headers,
+                json=payload
+            ) as response:
+
+                if response.status_code != 200:
+                    text = (await response.aread()).decode(errors="replace")
+                    raise Exception(f"GigaChat error: {response.status_code} - {text}")
+
+                async for line in response.aiter_lines():
+
+                    if not line.startswith("data:"):
+                        continue
+
+                    data = line[len("data:"):].strip()
+
+                    if data == "[DONE]":
+                        break
+
+                    try:
+                        chunk = json.loads(data)
+                        delta = chunk["choices"][0]["delta"].get("content", "")
+                    except Exception:
+                        continue
+
+                    if delta:
+                        yield delta
@@ -0,0 +1,267 @@
+# hedging.py
+# HEDGED UPSTREAM REQUESTS (TAIL-LATENCY CONTROL)
+
+import os
+import time
+import asyncio
+from collections import deque
+
+
+# ==========================================
+# SETTINGS
+# ==========================================
+
+HEDGE_ENABLED = os.getenv("GIGACHAT_HEDGE", "0") == "1"
+HEDGE_PERCENTILE = float(os.getenv("GIGACHAT_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_DELAY = float(os.getenv("GIGACHAT_HEDGE_MIN_DELAY", "2.0"))
+HEDGE_BUDGET = float(os.getenv("GIGACHAT_HEDGE_BUDGET", "0.05"))
+
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 20
+
+
+# ==========================================
+# LATENCY TRACKER
+# ==========================================
+
+class LatencyTracker:
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float):
+
+        if len(self.samples) < MIN_SAMPLES:
+            return None
+
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * p / 100))
+
+        return ordered[index]
+
+
+# ==========================================
+# HEDGER
+# ==========================================
+
+class Hedger:
+
+    def __init__(
+            self,
+            percentile: float = HEDGE_PERCENTILE,
+            min_delay: float = HEDGE_MIN_DELAY,
+            budget: float = HEDGE_BUDGET
+    ):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.budget = budget
+
+        self.latency = LatencyTracker()
+
+        # recent calls: True if the call sent a hedge
+        self.recent = deque(maxlen=LATENCY_WINDOW)
+
+        self.stats = {
+            "requests": 0,
+            "hedges": 0,
+            "hedge_wins": 0
+        }
+
+    def threshold(self) -> float:
+
+        observed = self.latency.percentile(self.percentile)
+
+        if observed is None:
+            return None
+
+        return max(self.min_delay, observed)
+
+    def _budget_allows(self) -> bool:
+
+        if not self.recent:
+            return False
+
+        return sum(self.recent) < self.budget * len(self.recent)
+
+    async def run(self, call):
+        """
+        call — zero-arg coroutine factory; invoked once, or twice
+        if the first attempt is slower than the hedge threshold.
+        """
+
+        self.stats["requests"] += 1
+
+        # latency is always measured from the primary's start: a hedge win
+        # counts as the time the caller waited, not the hedge's own duration
+        started = time.monotonic()
+        recorded = False
+
+        primary = asyncio.create_task(call())
+        tasks = {primary}
+
+        delay = self.threshold()
+        hedged = False
+
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+
+                if not done and self._budget_allows():
+                    hedged = True
+                    self.stats["hedges"] += 1
+                    tasks.add(asyncio.create_task(call()))
+
+            error = None
+
+            while tasks:
+                done, tasks = await asyncio.wait(
+                    tasks,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.stats["hedge_wins"] += 1
+
+                        self.latency.record(time.monotonic() - started)
+                        recorded = True
+
+                        return task.result()
+
+                    error = task.exception()
+
+            raise error
+
+        finally:
+            self.recent.append(hedged)
+
+            # cancelled from outside (deadline, disconnect) while still stalled:
+            # its elapsed time is a lower bound on the real latency, keep it
+            if not recorded and not primary.done():
+                self.latency.record(time.monotonic() - started)
+
+            for task in tasks:
+                task.cancel()
+
+    async def run_stream(self, open_stream):
+        """
+        open_stream — zero-arg factory of an async iterator of chunks.
+        Hedges on the first chunk only: once an attempt has produced
+        output, the rest of the answer comes from that attempt. The
+        tracked latency is time to first chunk.
+        """
+
+        self.stats["requests"] += 1
+
+        started = time.monotonic()
+        recorded = False
+
+        streams = {}
+        primary = self._start_stream(streams, open_stream)
+        tasks = {primary}
+
+        delay = self.threshold()
+        hedged = False
+
+        winner = None
+        first = None
+
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+
+                if not done and self._budget_allows():
+                    hedged = True
+                    self.stats["hedges"] += 1
+                    tasks.add(self._start_stream(streams, open_stream))
+
+            error = None
+
+            while tasks and winner is None:
+                done, tasks = await asyncio.wait(
+                    tasks,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.stats["hedge_wins"] += 1
+
+                        self.latency.record(time.monotonic() - started)
+                        recorded = True
+
+                        winner = streams[task]
+                        first = task.result()
+                        break
+
+                    error = task.exception()
+
+            if winner is None:
+                raise error
+
+            # the loser still holds an open upstream request: drop it now
+            await self._close_losers(tasks, streams)
+            tasks = set()
+
+            if first is None:
+                return
+
+            yield first
+
+            async for chunk in winner:
+                yield chunk
+
+        finally:
+            self.recent.append(hedged)
+
+            if not recorded and not primary.done():
+                self.latency.record(time.monotonic() - started)
+
+            await self._close_losers(tasks, streams)
+
+            if winner is not None:
+                await winner.aclose()
+
+    @staticmethod
+    def _start_stream(streams: dict, open_stream):
+
+        stream = open_stream()
+
+        async def first_chunk():
+            # None marks a stream that ended before its first chunk
+            try:
+                return await stream.__anext__()
+            except StopAsyncIteration:
+                return None
+
+        task = asyncio.ensure_future(first_chunk())
+        streams[task] = stream
+
+        return task
+
+    @staticmethod
+    async def _close_losers(tasks: set, streams: dict):
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        for task in tasks:
+            await streams[task].aclose()
+
+    def report(self) -> dict:
+
+        threshold = self.threshold()
+
+        return dict(
+            self.stats,
+            hedge_rate=round(sum(self.recent) / len(self.recent), 4) if self.recent else 0.0,
+            budget=self.budget,
+            threshold_seconds=round(threshold, 3) if threshold is not None else None
+        )
@@ -0,0 +1,137 @@
+# model_router.py
+# ADAPTIVE MODEL ROUTING (TIER + GENERATION LIMITS BY DIALOGUE DEPTH)
+
+import os
+import json
+
+
+# ==========================================
+# SETTINGS
+# ==========================================
+
+DEFAULT_ROUTES = {
+    # default tier: everything that is not clearly shallow or deep
+    "lite": {
+        "model": "GigaChat",
+        "max_tokens": 512,
+        "temperature": 0.7
+    },
+    # "привет", "ок", "да, понятно"
+    "surface": {
+        "model": "GigaChat",
+        "max_tokens": 200,
+        "temperature": 0.7
+    },
+    # prompts too large for the default tier
+    "pro": {
+        "model": "GigaChat-Pro",
+        "max_tokens": 512,
+        "temperature": 0.7
+    },
+    # deep / existential question in the current message
+    "max": {
+        "model": "GigaChat-Max",
+        "max_tokens": 768,
+        "temperature": 0.7
+    }
+}
+
+# prompts longer than this leave the default tier
+LARGE_PROMPT_CHARS = int(os.getenv("GIGACHAT_LARGE_PROMPT_CHARS", "12000"))
+
+# long-running dialogues ("deep investigation") get at least this many tokens
+DEEP_DIALOGUE_MAX_TOKENS = int(os.getenv("GIGACHAT_DEEP_DIALOGUE_MAX_TOKENS", "768"))
+
+
+def load_routes() -> dict:
+    """
+    GIGACHAT_ROUTES — JSON overriding any tier field, e.g.
+    {"max": {"model": "GigaChat-Pro"}, "surface": {"max_tokens": 150}}
+    """
+
+    routes = {name: dict(cfg) for name, cfg in DEFAULT_ROUTES.items()}
+
+    raw = os.getenv("GIGACHAT_ROUTES")
+
+    if raw:
+        for name, cfg in json.loads(raw).items():
+            routes.setdefault(name, {}).update(cfg)
+
+    return routes
+
+
+class ModelRouter:
+
+    def __init__(self, routes: dict = None, large_prompt_chars: int = LARGE_PROMPT_CHARS):
+
+        self.routes = routes or load_routes()
+        self.large_prompt_chars = large_prompt_chars
+
+        self.stats = {
+            name: {"requests": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            for name in self.routes
+        }
+
+
+    # ==========================================
+    # ROUTE
+    # ==========================================
+
+    def route(self, message_kind: str, depth_level: str, messages: list) -> dict:
+        """
+        message_kind — EmotionalState.classify_text of the current message.
+        Surface messages always stay on the cheap tier; dialogue depth
+        only raises the max_tokens ceiling, it never picks the tier.
+        """
+
+        prompt_chars = sum(len(msg["content"]) for msg in messages)
+
+        if message_kind == "surface":
+            return dict(self.routes["surface"], name="surface")
+
+        if message_kind == "deep":
+            name = "max"
+
+        elif prompt_chars > self.large_prompt_chars:
+            name = "pro"
+
+        else:
+            name = "lite"
+
+        route = dict(self.routes[name], name=name)
+
+        if depth_level == "deep investigation" and route.get("max_tokens"):
+            route["max_tokens"] = max(route["max_tokens"], DEEP_DIALOGUE_MAX_TOKENS)
+
+        return route
+
+
+    # ==========================================
+    # LATENCY
+    # ==========================================
+
+    def record(self, name: str, seconds: float):
+
+        stats = self.stats.setdefault(
+            name,
+            {"requests": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+        )
+
+        stats["requests"] += 1
+        stats["total_seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+    def report(self) -> dict:
+
+        return {
+            name: {
+                "model": self.routes.get(name, {}).get("model"),
+                "requests": stats["requests"],
+                "avg_seconds": (
+                    round(stats["total_seconds"] / stats["requests"], 3)
+                    if stats["requests"] else None
+                ),
+                "max_seconds": round(stats["max_seconds"], 3)
+            }
+            for name, stats in self.stats.items()
+        }
@@ -0,0 +1,159 @@
+# token_cache.py
+# OAUTH TOKEN CACHE (SHARED BETWEEN WORKER PROCESSES)
+
+import os
+import json
+import time
+import fcntl
+import asyncio
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+
+
+# ==========================================
+# SETTINGS
+# ==========================================
+
+TOKEN_CACHE_BACKEND = os.getenv("TOKEN_CACHE_BACKEND", "file")
+TOKEN_CACHE_PATH = os.getenv(
+    "TOKEN_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "gigachat_token.json")
+)
+
+LOCK_POLL_SECONDS = 0.05
+LOCK_TIMEOUT_SECONDS = 35
+
+
+class TokenCache(ABC):
+    """
+    Backend interface: read / write the token and hold
+    a refresh lock so only one worker calls OAuth at a time.
+    """
+
+    @abstractmethod
+    def read(self):
+        ...
+
+    @abstractmethod
+    def write(self, token: str, expire: float):
+        ...
+
+    @abstractmethod
+    def refresh_lock(self):
+        ...
+
+
+# ==========================================
+# IN-PROCESS BACKEND
+# ==========================================
+
+class MemoryTokenCache(TokenCache):
+
+    def __init__(self):
+        self.token = None
+        self.expire = 0
+        self._lock = asyncio.Lock()
+
+    def read(self):
+        if self.token and time.time() < self.expire:
+            return self.token, self.expire
+        return None
+
+    def write(self, token: str, expire: float):
+        self.token = token
+        self.expire = expire
+
+    @asynccontextmanager
+    async def refresh_lock(self):
+        async with self._lock:
+            yield
+
+
+# ==========================================
+# FILE BACKEND (HOST-WIDE)
+# ==========================================
+
+class FileTokenCache(TokenCache):
+
+    def __init__(self, path: str = TOKEN_CACHE_PATH):
+        self.path = path
+        self.lock_path = path + ".lock"
+
+    def read(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        token = data.get("access_token")
+        expire = data.get("expire", 0)
+
+        if token and time.time() < expire:
+            return token, expire
+
+        return None
+
+    def write(self, token: str, expire: float):
+
+        directory = os.path.dirname(self.path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".gigachat_token.")
+
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"access_token": token, "expire": expire}, f)
+                f.flush()
+                os.fsync(f.fileno())
+
+            # atomic swap: readers see either the old or the new token
+            os.replace(tmp_path, self.path)
+
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    @asynccontextmanager
+    async def refresh_lock(self):
+
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        deadline = time.time() + LOCK_TIMEOUT_SECONDS
+
+        try:
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.time() > deadline:
+                        raise TimeoutError("Token cache lock timeout")
+                    await asyncio.sleep(LOCK_POLL_SECONDS)
+
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+        finally:
+            os.close(fd)
+
+
+# ==========================================
+# FACTORY
+# ==========================================
+
+TOKEN_CACHE_BACKENDS = {
+    "memory": MemoryTokenCache,
+    "file": FileTokenCache
+}
+
+
+def create_token_cache(backend: str = TOKEN_CACHE_BACKEND) -> TokenCache:
+
+    if backend not in TOKEN_CACHE_BACKENDS:
+        raise RuntimeError(f"Unknown TOKEN_CACHE_BACKEND: {backend}")
+
+    return TOKEN_CACHE_BACKENDS[backend]()
@@ -0,0 +1,297 @@
+# replay.py
+# DETERMINISTIC TRAFFIC REPLAY (FAKE GIGACHAT + FAKE SUPABASE)
+#
+# Replay a capture produced by TRAFFIC_CAPTURE_PATH against this build:
+#   python replay.py run trace.jsonl --speed 2 --out this_build.json
+# Compare two builds:
+#   python replay.py compare base.json this_build.json
+#
+# Every captured turn is replayed through /chat, including /ws/chat turns
+# and turns that ended in a deadline, disconnect or error: their recorded
+# phase times (up to the point they stopped) are what the fakes reproduce.
+
+import os
+import sys
+import json
+import time
+import types
+import asyncio
+import argparse
+import contextvars
+
+
+# trace entry for the request currently being replayed
+current_entry = contextvars.ContextVar("current_entry", default=None)
+
+
+# ==========================================
+# FAKE SUPABASE (RECORDED STORAGE LATENCY)
+# ==========================================
+
+class FakeResponse:
+
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+
+    def __init__(self, table: str):
+        self.table = table
+        self.action = "select"
+        self.columns = "*"
+
+    def select(self, columns: str = "*", *args, **kwargs):
+        self.columns = columns
+        return self
+
+    def insert(self, *args, **kwargs):
+        self.action = "insert"
+        return self
+
+    def delete(self, *args, **kwargs):
+        self.action = "delete"
+        return self
+
+    def eq(self, *args, **kwargs):
+        return self
+
+    def or_(self, *args, **kwargs):
+        return self
+
+    @property
+    def not_(self):
+        return self
+
+    def is_(self, *args, **kwargs):
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def limit(self, *args, **kwargs):
+        return self
+
+    def execute(self):
+
+        entry = current_entry.get() or {}
+
+        # get_last_seq: one indexed row, its latency is not in the trace
+        if self.action == "select" and self.table == "chat_memory" and self.columns == "seq":
+            last = entry.get("history_size", 0)
+            return FakeResponse([{"seq": last}] if last else [])
+
+        # the real client is synchronous too, so block the loop the same way
+        if self.action == "select" and self.table == "chat_memory":
+            time.sleep(entry.get("history_seconds") or 0)
+            return FakeResponse(self._history(entry))
+
+        if self.action == "insert" and self.table == "chat_memory":
+            time.sleep((entry.get("save_seconds") or 0) / 2)
+
+        if self.action == "insert_turn":
+            time.sleep(entry.get("save_seconds") or 0)
+            last = entry.get("history_size", 0)
+            return FakeResponse([{"user_seq": last + 1, "assistant_seq": last + 2}])
+
+        return FakeResponse([])
+
+    def _history(self, entry: dict) -> list:
+
+        rows = []
+
+        for i in range(entry.get("history_size", 0)):
+            rows.append({
+                "id": i,
+                "seq": i + 1,
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": "x" * (entry.get("message_len", 0) if i % 2 == 0 else entry.get("response_len", 0)),
+                "created_at": i
+            })
+
+        return rows
+
+
+class FakeSupabase:
+
+    def table(self, name: str):
+        return FakeQuery(name)
+
+    def rpc(self, name: str, params: dict):
+        query = FakeQuery("chat_memory")
+
+        if name == "chat_append_turn":
+            query.action = "insert_turn"
+
+        return query
+
+
+# ==========================================
+# FAKE GIGACHAT (RECORDED UPSTREAM LATENCY)
+# ==========================================
+
+class FakeGigaChatProvider:
+
+    async def generate(self, messages: list, route: dict = None):
+        entry = current_entry.get() or {}
+        await asyncio.sleep(entry.get("upstream_seconds") or 0)
+        return "x" * entry.get("response_len", 0)
+
+    async def generate_stream(self, messages: list, route: dict = None):
+        yield await self.generate(messages, route)
+
+
+# ==========================================
+# LOAD APP WITH FAKE BACKENDS
+# ==========================================
+
+def load_app():
+
+    os.environ.setdefault("SERVER_API_KEY", "replay")
+    os.environ.setdefault("GIGACHAT_CLIENT_ID", "replay")
+    os.environ.setdefault("GIGACHAT_CLIENT_SECRET", "replay")
+    os.environ.pop("TRAFFIC_CAPTURE_PATH", None)
+
+    sys.modules["db"] = types.SimpleNamespace(supabase=FakeSupabase())
+
+    import main
+
+    main.ai_provider = FakeGigaChatProvider()
+    main.limiter.enabled = False
+
+    return main
+
+
+# ==========================================
+# REPLAY
+# ==========================================
+
+def percentile(values: list, p: float):
+
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(len(ordered) * p / 100))
+
+    return round(ordered[index], 4)
+
+
+def summarize(latencies: list, errors: int) -> dict:
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50": percentile(latencies, 50),
+        "p90": percentile(latencies, 90),
+        "p99": percentile(latencies, 99),
+        "max": round(max(latencies), 4) if latencies else None
+    }
+
+
+async def replay(entries: list, speed: float) -> dict:
+
+    import httpx
+
+    main = load_app()
+    headers = {"x-api-key": os.environ["SERVER_API_KEY"]}
+
+    latencies = []
+    errors = 0
+
+    transport = httpx.ASGITransport(app=main.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as client:
+
+        async def send(entry: dict):
+            nonlocal errors
+
+            current_entry.set(entry)
+            started = time.monotonic()
+
+            response = await client.post(
+                "/chat",
+                headers=headers,
+                json={"chat_id": entry["chat"], "message": "x" * max(1, entry["message_len"])}
+            )
+
+            if response.status_code == 200:
+                latencies.append(time.monotonic() - started)
+            else:
+                errors += 1
+
+        tasks = []
+        first_ts = entries[0]["ts"] if entries else 0
+        replay_start = time.monotonic()
+
+        for entry in entries:
+            delay = (entry["ts"] - first_ts) / speed - (time.monotonic() - replay_start)
+
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            tasks.append(asyncio.create_task(send(entry)))
+
+        await asyncio.gather(*tasks)
+
+    return summarize(latencies, errors)
+
+
+# ==========================================
+# COMPARE
+# ==========================================
+
+def compare(base: dict, current: dict):
+
+    print(f"{'metric':<8}{'base':>12}{'current':>12}{'delta':>10}")
+
+    for key in ("p50", "p90", "p99", "max"):
+        a, b = base.get(key), current.get(key)
+
+        if a and b is not None:
+            delta = f"{(b - a) / a * 100:+.1f}%"
+        else:
+            delta = "-"
+
+        print(f"{key:<8}{str(a):>12}{str(b):>12}{delta:>10}")
+
+    print(f"{'errors':<8}{base.get('errors'):>12}{current.get('errors'):>12}")
+
+
+def main_cli():
+
+    parser = argparse.ArgumentParser(description="Replay captured /chat traffic")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run")
+    run.add_argument("trace")
+    run.add_argument("--speed", type=float, default=1.0, help="rate multiplier (2 = twice as fast)")
+    run.add_argument("--out", help="write latency summary JSON here")
+
+    cmp = commands.add_parser("compare")
+    cmp.add_argument("base")
+    cmp.add_argument("current")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        with open(args.trace) as f:
+            entries = sorted((json.loads(line) for line in f if line.strip()), key=lambda e: e["ts"])
+
+        summary = asyncio.run(replay(entries, args.speed))
+        print(json.dumps(summary, indent=2))
+
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(summary, f, indent=2)
+
+    else:
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+
+        compare(base, current)
+
+
+if __name__ == "__main__":
+    main_cli()
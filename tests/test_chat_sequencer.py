@@ -0,0 +1,74 @@
+# test_chat_sequencer.py
+# queued turns on one chat respect the request deadline
+
+import os
+import sys
+import types
+import asyncio
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from replay import FakeSupabase
+
+sys.modules.setdefault("db", types.SimpleNamespace(supabase=FakeSupabase()))
+
+from chat_sequencer import ChatSequencer
+from deadline import Deadline, DeadlineExceeded, ClientDisconnected
+
+
+async def _hold(sequencer: ChatSequencer, chat_id: str, release: asyncio.Event):
+    async with sequencer.turn(chat_id):
+        await release.wait()
+
+
+def test_queued_turn_hits_deadline_and_lock_is_not_leaked():
+
+    async def scenario():
+        sequencer = ChatSequencer()
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(sequencer, "c1", release))
+        await asyncio.sleep(0)
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        with pytest.raises(DeadlineExceeded):
+            async with sequencer.turn("c1", Deadline(0.2)):
+                pass
+
+        assert loop.time() - started < 1
+
+        release.set()
+        await holder
+
+        async with sequencer.turn("c1", Deadline(1)):
+            pass
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
+
+
+def test_queued_turn_dropped_when_client_leaves():
+
+    async def scenario():
+        sequencer = ChatSequencer()
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(sequencer, "c1", release))
+        await asyncio.sleep(0)
+
+        async def is_disconnected():
+            return True
+
+        with pytest.raises(ClientDisconnected):
+            async with sequencer.turn("c1", Deadline(5), is_disconnected):
+                pass
+
+        release.set()
+        await holder
+
+        # another chat was never blocked
+        async with sequencer.turn("c2", Deadline(1)):
+            pass
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
@@ -0,0 +1,97 @@
+# test_disconnect.py
+# /chat must cancel the upstream call when the client goes away
+
+import os
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from replay import load_app
+
+
+UPSTREAM_SECONDS = 5
+DISCONNECT_AFTER = 0.3
+
+
+class SlowProvider:
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.cancelled = False
+        self.hedger = None
+
+    async def generate(self, messages: list, route: dict = None):
+        self.started.set()
+        try:
+            await asyncio.sleep(UPSTREAM_SECONDS)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return "late answer"
+
+
+async def _drive(app, body: bytes):
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    # like a real server: once the client is gone receive() returns the
+    # disconnect without awaiting (is_disconnected() polls in a cancelled scope)
+    async def receive():
+        if messages:
+            return messages.pop(0)
+
+        remaining = started + DISCONNECT_AFTER - loop.time()
+
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/chat",
+        "raw_path": b"/chat",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"x-api-key", os.environ["SERVER_API_KEY"].encode()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+
+    await asyncio.wait_for(app(scope, receive, send), UPSTREAM_SECONDS)
+
+    return sent, loop.time() - started
+
+
+def test_disconnect_cancels_upstream():
+
+    main = load_app()
+    provider = SlowProvider()
+    main.ai_provider = provider
+    main.cancellations["disconnect"] = 0
+
+    sent, elapsed = asyncio.run(
+        _drive(main.app, b'{"chat_id": "c1", "message": "hello"}')
+    )
+
+    start = next(m for m in sent if m["type"] == "http.response.start")
+
+    assert provider.started.is_set()
+    assert provider.cancelled
+    assert start["status"] == 499
+    assert main.cancellations["disconnect"] == 1
+    assert elapsed < UPSTREAM_SECONDS / 2
@@ -0,0 +1,46 @@
+# test_hedging.py
+# a stalled stream is hedged on its first chunk and the loser is closed
+
+import os
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from providers.hedging import Hedger, MIN_SAMPLES
+
+
+def test_stalled_stream_is_hedged_and_loser_closed():
+
+    async def scenario():
+        hedger = Hedger(min_delay=0.05, budget=1.0)
+
+        for _ in range(MIN_SAMPLES):
+            hedger.latency.record(0.05)
+        hedger.recent.append(False)
+
+        attempts = []
+        closed = []
+
+        async def stream():
+            attempt = len(attempts)
+            attempts.append(attempt)
+
+            try:
+                if attempt == 0:
+                    await asyncio.sleep(10)
+
+                yield f"a{attempt}"
+                yield "b"
+
+            finally:
+                closed.append(attempt)
+
+        chunks = [chunk async for chunk in hedger.run_stream(stream)]
+
+        assert chunks == ["a1", "b"]
+        assert sorted(closed) == [0, 1]
+        assert hedger.stats["hedges"] == 1
+        assert hedger.stats["hedge_wins"] == 1
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
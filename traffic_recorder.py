@@ -0,0 +1,151 @@
+# traffic_recorder.py
+# ANONYMIZED TRAFFIC CAPTURE (REQUEST SHAPES FOR REPLAY)
+
+import os
+import json
+import time
+import queue
+import hashlib
+import secrets
+import threading
+import traceback
+from contextlib import contextmanager
+
+
+# ==========================================
+# SETTINGS
+# ==========================================
+
+TRAFFIC_CAPTURE_PATH = os.getenv("TRAFFIC_CAPTURE_PATH")
+
+# without a fixed salt chat hashes are only stable within one process
+TRAFFIC_CAPTURE_SALT = os.getenv("TRAFFIC_CAPTURE_SALT") or secrets.token_hex(16)
+
+TRAFFIC_CAPTURE_QUEUE_SIZE = 10000
+
+
+# ==========================================
+# ONE TURN
+# ==========================================
+
+class TurnTrace:
+
+    def __init__(self, chat_id: str, message: str, channel: str):
+
+        # arrival time: replay sends requests at this offset
+        self.arrived_at = time.time()
+
+        self.chat_id = chat_id
+        self.message_len = len(message or "")
+        self.channel = channel
+
+        self.history_size = 0
+        self.response_len = 0
+        self.outcome = "error"
+
+        self.seconds = {
+            "history_seconds": None,
+            "upstream_seconds": None,
+            "save_seconds": None
+        }
+
+    @contextmanager
+    def timed(self, phase: str):
+        """
+        Times one phase; a phase cut short by a deadline or a
+        disconnect keeps the time it ran, which is the slow tail.
+        """
+
+        started = time.monotonic()
+
+        try:
+            yield
+        finally:
+            self.seconds[phase] = time.monotonic() - started
+
+
+# ==========================================
+# RECORDER
+# ==========================================
+
+class TrafficRecorder:
+
+    def __init__(self, path: str = TRAFFIC_CAPTURE_PATH, salt: str = TRAFFIC_CAPTURE_SALT):
+        self.path = path
+        self.salt = salt
+
+        self.queue = queue.Queue(maxsize=TRAFFIC_CAPTURE_QUEUE_SIZE)
+        self.writer = None
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def hash_chat_id(self, chat_id: str) -> str:
+        return hashlib.sha256((self.salt + str(chat_id)).encode()).hexdigest()[:16]
+
+    def start(self, chat_id: str, message: str, channel: str) -> TurnTrace:
+        return TurnTrace(chat_id, message, channel)
+
+    def record(self, trace: TurnTrace):
+
+        if not self.enabled:
+            return
+
+        entry = {
+            "ts": round(trace.arrived_at, 4),
+            "chat": self.hash_chat_id(trace.chat_id),
+            "channel": trace.channel,
+            "outcome": trace.outcome,
+            "message_len": trace.message_len,
+            "history_size": trace.history_size,
+            "response_len": trace.response_len
+        }
+
+        for phase, seconds in trace.seconds.items():
+            entry[phase] = round(seconds, 4) if seconds is not None else None
+
+        if self.writer is None:
+            self.writer = threading.Thread(target=self._write_loop, daemon=True)
+            self.writer.start()
+
+        # never block the event loop on disk: the writer thread owns the file
+        try:
+            self.queue.put_nowait(json.dumps(entry) + "\n")
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+
+        if self.writer is None:
+            return
+
+        self.queue.put(None)
+        self.writer.join(timeout=5)
+        self.writer = None
+
+
+    # ==========================================
+    # WRITER THREAD
+    # ==========================================
+
+    def _write_loop(self):
+
+        try:
+            with open(self.path, "a") as f:
+                while True:
+                    line = self.queue.get()
+
+                    if line is None:
+                        return
+
+                    f.write(line)
+
+                    if self.queue.empty():
+                        f.flush()
+
+        except Exception as e:
+            print("=== TRAFFIC CAPTURE ERROR ===")
+            print(str(e))
+            traceback.print_exc()